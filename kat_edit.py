@@ -14,6 +14,15 @@ Usage examples:
       --set paths[0].activeState=true \
       --set username="Alice"
 
+  # Many fields at once: a JSON patch (objects descend, arrays go by index)
+  python kat_edit.py edit /work/PersData.kat /work/Patched.kat --set-json patch.json
+      # patch.json: {"coins": 999999, "userSettings": {"energyCap": 120}}
+      # (only the fields to change: a full dump is not a valid patch)
+
+  # 3) Apply the same edits to several saves (helpers compiled once)
+  python kat_edit.py batch /work/Slot1.kat /work/Slot2.kat --outdir /work/patched \
+      --set coins=999999
+
 Path syntax:
   - Dot for dict/field names:   userSettings.energyCap
   - Brackets for lists:         paths[0].memberIDs[2]
@@ -23,46 +32,44 @@ Value syntax:
   - Quotes force string: "00123"
 """
 
-import sys, os, json, re
+import sys, os, hashlib
 import argparse
 
-def _to_net(val):
-    """Convert Python primitives to real .NET primitives for BinaryFormatter."""
+_NET_CONV = None  # exact Python type -> .NET converter, built on first use
+
+def _net_converters():
+    global _NET_CONV
     from System import Int32, Int64, Double, Boolean, String, Decimal
-    if val is None:
-        return None
-    if isinstance(val, bool):
-        return Boolean(val)
-    if isinstance(val, int):
+
+    def int_to_net(val):
         # Int32 first, fall back to Int64, else Decimal
         if -2147483648 <= val <= 2147483647:
             return Int32(val)
         if -9223372036854775808 <= val <= 9223372036854775807:
             return Int64(val)
         return Decimal(val)  # very large ints
-    if isinstance(val, float):
-        return Double(val)
-    if isinstance(val, str):
-        return String(val)
-    # Already a .NET object or unsupported python type: pass through
-    return val
 
-def build_helper_types():
-    import clr
-    try:
-        clr.AddReference("System")
-        clr.AddReference("System.Core")
-        clr.AddReference("Microsoft.CSharp")
-    except Exception:
-        pass
+    _NET_CONV = {bool: Boolean, int: int_to_net, float: Double, str: String}
+    return _NET_CONV
 
-    from Microsoft.CSharp import CSharpCodeProvider
-    from System.CodeDom.Compiler import CompilerParameters
+def _to_net(val):
+    """Convert Python primitives to real .NET primitives for BinaryFormatter."""
+    conv = (_NET_CONV or _net_converters()).get(type(val))
+    # None, already a .NET object or unsupported python type: pass through
+    return conv(val) if conv is not None else val
+
+_HELPER_CACHE = None
 
-    cs = r'''
+_HELPER_CS = r'''
     using System;
+    using System.Collections;
     using System.Collections.Generic;
+    using System.Globalization;
+    using System.IO;
+    using System.Reflection;
+    using System.Runtime.CompilerServices;
     using System.Runtime.Serialization;
+    using System.Text;
 
     namespace KatRoundtrip {
       [Serializable]
@@ -73,6 +80,10 @@ def build_helper_types():
 
         public Node() {}
 
+        // Typed access to Data, so callers get the generic lookup, not the IDictionary one
+        public bool TryGet(string key, out object value) { return Data.TryGetValue(key, out value); }
+        public void Set(string key, object value) { Data[key] = value; }
+
         // Called by BinaryFormatter when we redirected to Node
         protected Node(SerializationInfo info, StreamingContext context) {
           this.FullTypeName = info.FullTypeName;
@@ -97,7 +108,20 @@ def build_helper_types():
 
       // Redirect Everbyte types -> Node on deserialize
       public class RedirectBinder : SerializationBinder {
+        // Resolutions are pure functions of the names; share them across files in a batch
+        private static readonly Dictionary<string, Type> resolved = new Dictionary<string, Type>();
+
         public override Type BindToType(string assemblyName, string typeName) {
+          string cacheKey = assemblyName + "|" + typeName;
+          Type t;
+          if (!resolved.TryGetValue(cacheKey, out t)) {
+            t = Resolve(assemblyName, typeName);
+            resolved[cacheKey] = t;
+          }
+          return t;
+        }
+
+        private static Type Resolve(string assemblyName, string typeName) {
           if (!string.IsNullOrEmpty(typeName) && typeName.StartsWith("Everbyte.TextGame.Saving"))
             return typeof(Node);
           if (!string.IsNullOrEmpty(assemblyName) && assemblyName.StartsWith("Everbyte.TextGame.Saving"))
@@ -117,316 +141,882 @@ def build_helper_types():
           return typeof(object);
         }
       }
+
+      // Reference-identity set, used for cycle detection while walking the graph
+      public class IdentitySet {
+        private readonly HashSet<object> items = new HashSet<object>(new RefComparer());
+
+        // false when o was already seen
+        public bool Add(object o) { return items.Add(o); }
+
+        private sealed class RefComparer : IEqualityComparer<object> {
+          public new bool Equals(object a, object b) { return ReferenceEquals(a, b); }
+          public int GetHashCode(object o) { return RuntimeHelpers.GetHashCode(o); }
+        }
+      }
+
+      // Writes the graph as JSON in one managed call, laid out like Python's
+      // json.dump(..., ensure_ascii=False, indent=2) with floats as Python repr.
+      // Intentional change from the former Python dump: a Node without a
+      // stream type/assembly name prints "" there, where str(None) gave "None".
+      public class JsonDump {
+        private const BindingFlags AllFields = BindingFlags.Instance | BindingFlags.Public | BindingFlags.NonPublic;
+        // Cyclic graphs under assumeTree would otherwise end in an uncatchable StackOverflowException
+        private const int MaxDepth = 5000;
+        private static readonly Dictionary<Type, FieldInfo[]> fieldsCache = new Dictionary<Type, FieldInfo[]>();
+
+        private TextWriter w;
+        private IdentitySet seen;   // null with assumeTree: no shared/cyclic reference tracking
+
+        public void Write(object root, Stream output, bool assumeTree) {
+          w = new StreamWriter(new BufferedStream(output, 1 << 20), new UTF8Encoding(false));
+          seen = assumeTree ? null : new IdentitySet();
+          try {
+            Emit(root, 0);
+          } finally {
+            w.Flush();
+          }
+        }
+
+        void Emit(object x, int level) {
+          if (x == null) { w.Write("null"); return; }
+          string s = x as string;
+          if (s != null) { WriteString(s); return; }
+          if (x is bool) { w.Write((bool)x ? "true" : "false"); return; }
+          if (x is char) { WriteString(x.ToString()); return; }
+          if (x is double) { w.Write(FormatFloat((double)x)); return; }
+          if (x is float) { w.Write(FormatFloat((float)x)); return; }
+          Type t = x.GetType();
+          if (t.IsPrimitive) { w.Write(Convert.ToString(x, CultureInfo.InvariantCulture)); return; }
+
+          if (seen != null && !seen.Add(x)) { w.Write("null"); return; }
+          if (level >= MaxDepth)
+            throw new InvalidOperationException(
+              "Object graph nested deeper than " + MaxDepth + " levels; the save probably has cycles (drop --assume-tree)");
+
+          bool first = true;
+          var node = x as Node;
+          if (node != null) {
+            Next(ref first, '{', level);
+            Key("$original_dotnet_type");
+            WriteString(node.FullTypeName ?? "");
+            Next(ref first, '{', level);
+            Key("$original_assembly");
+            WriteString(node.AssemblyName ?? "");
+            if (node.Data != null) {
+              foreach (var kv in node.Data) {
+                Next(ref first, '{', level);
+                Key(kv.Key);
+                Emit(kv.Value, level + 1);
+              }
+            }
+            Close(first, '{', '}', level);
+            return;
+          }
+
+          // value-like
+          if (x is DateTime) { WriteString(((DateTime)x).ToString("o")); return; }
+          if (x is decimal) { w.Write(FormatFloat((double)(decimal)x)); return; }
+          if (x is Guid) { WriteString(x.ToString()); return; }
+
+          var bytes = x as byte[];
+          if (bytes != null) {
+            foreach (byte b in bytes) {
+              Next(ref first, '[', level);
+              w.Write(b.ToString(CultureInfo.InvariantCulture));
+            }
+            Close(first, '[', ']', level);
+            return;
+          }
+
+          var dict = x as IDictionary;
+          if (dict != null) {
+            foreach (DictionaryEntry e in dict) {
+              Next(ref first, '{', level);
+              Key(KeyString(e.Key));
+              Emit(e.Value, level + 1);
+            }
+            Close(first, '{', '}', level);
+            return;
+          }
+
+          // IEnumerable (not string); a failing enumerator ends the list
+          var seq = x as IEnumerable;
+          if (seq != null) {
+            IEnumerator it = seq.GetEnumerator();
+            while (true) {
+              object cur;
+              try {
+                if (!it.MoveNext()) break;
+                cur = it.Current;
+              } catch {
+                break;
+              }
+              Next(ref first, '[', level);
+              Emit(cur, level + 1);
+            }
+            Close(first, '[', ']', level);
+            return;
+          }
+
+          // fallback reflection
+          FieldInfo[] fields;
+          try {
+            if (!fieldsCache.TryGetValue(t, out fields)) {
+              fields = t.GetFields(AllFields);
+              fieldsCache[t] = fields;
+            }
+          } catch {
+            string text;
+            try { text = x.ToString(); } catch { text = null; }
+            if (text == null) w.Write("null"); else WriteString(text);
+            return;
+          }
+          Next(ref first, '{', level);
+          Key("$type");
+          WriteString(t.FullName);
+          foreach (FieldInfo f in fields) {
+            object v;
+            try { v = f.GetValue(x); } catch { continue; }
+            Next(ref first, '{', level);
+            Key(f.Name);
+            Emit(v, level + 1);
+          }
+          Close(first, '{', '}', level);
+        }
+
+        // Containers open on their first item, so empty ones print as {} / []
+        void Next(ref bool first, char open, int level) {
+          w.Write(first ? open : ',');
+          first = false;
+          NewLine(level + 1);
+        }
+
+        void Close(bool first, char open, char close, int level) {
+          if (first) {
+            w.Write(open);
+          } else {
+            NewLine(level);
+          }
+          w.Write(close);
+        }
+
+        void NewLine(int level) {
+          w.Write('\n');
+          for (int i = 0; i < level; i++) w.Write("  ");
+        }
+
+        void Key(string k) {
+          WriteString(k);
+          w.Write(": ");
+        }
+
+        // Same escapes as json.encoder.encode_basestring (non-ASCII left as is)
+        void WriteString(string s) {
+          w.Write('"');
+          foreach (char c in s) {
+            switch (c) {
+              case '"': w.Write("\\\""); break;
+              case '\\': w.Write("\\\\"); break;
+              case '\n': w.Write("\\n"); break;
+              case '\r': w.Write("\\r"); break;
+              case '\t': w.Write("\\t"); break;
+              case '\b': w.Write("\\b"); break;
+              case '\f': w.Write("\\f"); break;
+              default:
+                if (c < ' ') w.Write("\\u" + ((int)c).ToString("x4"));
+                else w.Write(c);
+                break;
+            }
+          }
+          w.Write('"');
+        }
+
+        // Python's str() of a dict key; Node.Data and most dicts are string-keyed
+        static string KeyString(object k) {
+          string ks = k as string;
+          if (ks != null) return ks;
+          if (k is bool) return (bool)k ? "True" : "False";
+          return Convert.ToString(k, CultureInfo.InvariantCulture);
+        }
+
+        // Python float repr: shortest round-trip digits, positional for
+        // exponents in [-4, 16), else d.ddde+XX
+        static string FormatFloat(double d) {
+          if (double.IsNaN(d)) return "NaN";
+          if (double.IsPositiveInfinity(d)) return "Infinity";
+          if (double.IsNegativeInfinity(d)) return "-Infinity";
+          if (d == 0) return BitConverter.DoubleToInt64Bits(d) < 0 ? "-0.0" : "0.0";
+
+          // "R" is not shortest on .NET Framework/Mono (15 digits, else 17),
+          // so take the first precision that round-trips. For normal doubles
+          // G15 never gives more digits than the shortest form, so the search
+          // starts at 15 and goes on to 16/17 when those are needed;
+          // subnormals have fewer significant digits and start at 1.
+          var inv = CultureInfo.InvariantCulture;
+          string r = null;
+          for (int p = Math.Abs(d) < 2.2250738585072014E-308 ? 1 : 15; p <= 17; p++) {
+            r = d.ToString("G" + p, inv);
+            if (double.Parse(r, NumberStyles.Float, inv) == d) break;
+          }
+          string sign = "";
+          if (r[0] == '-') { sign = "-"; r = r.Substring(1); }
+          int exp = 0;
+          int ePos = r.IndexOfAny(new[] { 'E', 'e' });
+          if (ePos >= 0) {
+            exp = int.Parse(r.Substring(ePos + 1), NumberStyles.AllowLeadingSign, CultureInfo.InvariantCulture);
+            r = r.Substring(0, ePos);
+          }
+          int dot = r.IndexOf('.');
+          string digits = dot >= 0 ? r.Remove(dot, 1) : r;
+          int point = (dot >= 0 ? dot : r.Length) + exp;   // value = 0.digits * 10^point
+          int lead = 0;
+          while (lead < digits.Length - 1 && digits[lead] == '0') lead++;
+          digits = digits.Substring(lead);
+          point -= lead;
+          digits = digits.TrimEnd('0');
+          if (digits.Length == 0) return sign + "0.0";
+
+          int sci = point - 1;
+          if (sci >= -4 && sci < 16) {
+            if (point <= 0)
+              return sign + "0." + new string('0', -point) + digits;
+            if (point >= digits.Length)
+              return sign + digits + new string('0', point - digits.Length) + ".0";
+            return sign + digits.Substring(0, point) + "." + digits.Substring(point);
+          }
+          string mant = digits.Length > 1 ? digits.Substring(0, 1) + "." + digits.Substring(1) : digits;
+          return sign + mant + "e" + (sci < 0 ? "-" : "+") + Math.Abs(sci).ToString("00", CultureInfo.InvariantCulture);
+        }
+      }
+
+      // The path resolved but the value cannot be stored there (Python side: TypeError)
+      public class AssignException : ArgumentException {
+        public AssignException(string message) : base(message) {}
+      }
+
+      // Resolves paths like paths[0].memberIDs[2] in managed code.
+      // Node.Data is stepped into automatically; dict keys fall back to a
+      // ToString() match, indices go through IList (List`1, arrays) or, on a
+      // dictionary, look up the integer key.
+      // Assignments queued with Add/AddJson share one prefix trie, so Apply
+      // visits each intermediate object once however many paths go through it.
+      public class Walker {
+        private sealed class Trie {
+          public readonly Dictionary<object, Trie> Children = new Dictionary<object, Trie>();
+          public string Path;      // first full path through this node, for errors
+          public bool HasValue;
+          public object Value;
+        }
+
+        private Trie pending = new Trie();
+
+        // Queue an assignment; path syntax errors are reported here
+        public void Add(string path, object value) {
+          List<object> tokens = Parse(path);
+          if (tokens.Count == 0)
+            throw new ArgumentException("Could not resolve path: " + path);
+          Trie node = pending;
+          foreach (object tk in tokens)
+            node = Child(node, tk, path);
+          SetLeaf(node, value);
+        }
+
+        // Queue every leaf of a JSON patch like {"coins": 999, "userSettings": {"energyCap": 120}}.
+        // Objects descend by key, arrays by position; other values are assigned,
+        // typed like _to_net (Int32, then Int64, then Decimal; Double; String; Boolean; null).
+        // Strict JSON numbers (no 01, +5, 1.); empty objects/arrays are rejected,
+        // and so are the dump's "$..." keys: a full dump is not a patch.
+        public void AddJson(string json) {
+          int pos = 0;
+          SkipWs(json, ref pos);
+          if (pos >= json.Length || json[pos] != '{')
+            throw new ArgumentException("JSON patch must be an object");
+          AddJsonContainer(pending, "", json, ref pos);
+          SkipWs(json, ref pos);
+          if (pos < json.Length) throw BadJson(pos);
+        }
+
+        static Trie Child(Trie node, object token, string path) {
+          Trie child;
+          if (!node.Children.TryGetValue(token, out child)) {
+            child = new Trie();
+            child.Path = path;
+            node.Children[token] = child;
+          }
+          return child;
+        }
+
+        // A value replaces whatever was queued at or below this node (a repeated
+        // path, or a --set on an object the patch descends into): last one wins
+        static void SetLeaf(Trie node, object value) {
+          node.HasValue = true;
+          node.Value = value;
+          node.Children.Clear();
+        }
+
+        static void AddJsonContainer(Trie node, string path, string json, ref int pos) {
+          char open = json[pos++];
+          char close = open == '{' ? '}' : ']';
+          SkipWs(json, ref pos);
+          if (pos < json.Length && json[pos] == close) {
+            // would assign nothing; most likely a mistake in the patch
+            throw new ArgumentException(path.Length == 0
+              ? "JSON patch is empty"
+              : "Empty " + (open == '{' ? "object" : "array") + " in JSON patch at " + path);
+          }
+          int index = 0;
+          while (true) {
+            object token;
+            string childPath;
+            if (open == '{') {
+              if (pos >= json.Length || json[pos] != '"') throw BadJson(pos);
+              string key = ReadJsonString(json, ref pos);
+              if (key.StartsWith("$", StringComparison.Ordinal)) {
+                // $type, $original_dotnet_type, ... would become new Node fields
+                throw new ArgumentException("Key " + key + " in JSON patch at " + (path.Length == 0 ? "top level" : path) +
+                  " is dump metadata; a full dump is not a valid patch, keep only the fields to change");
+              }
+              SkipWs(json, ref pos);
+              if (pos >= json.Length || json[pos] != ':') throw BadJson(pos);
+              pos++;
+              token = key;
+              childPath = path.Length == 0 ? key : path + "." + key;
+            } else {
+              token = index;
+              childPath = path + "[" + index + "]";
+              index++;
+            }
+            SkipWs(json, ref pos);
+            Trie child = Child(node, token, childPath);
+            if (pos < json.Length && (json[pos] == '{' || json[pos] == '[')) {
+              child.HasValue = false;   // a repeated key: the later object wins
+              AddJsonContainer(child, childPath, json, ref pos);
+            } else {
+              SetLeaf(child, ReadJsonScalar(json, ref pos));
+            }
+            SkipWs(json, ref pos);
+            if (pos < json.Length && json[pos] == ',') { pos++; SkipWs(json, ref pos); continue; }
+            if (pos < json.Length && json[pos] == close) { pos++; return; }
+            throw BadJson(pos);
+          }
+        }
+
+        static object ReadJsonScalar(string json, ref int pos) {
+          if (pos >= json.Length) throw BadJson(pos);
+          char c = json[pos];
+          if (c == '"') return ReadJsonString(json, ref pos);
+          if (string.CompareOrdinal(json, pos, "true", 0, 4) == 0) { pos += 4; return true; }
+          if (string.CompareOrdinal(json, pos, "false", 0, 5) == 0) { pos += 5; return false; }
+          if (string.CompareOrdinal(json, pos, "null", 0, 4) == 0) { pos += 4; return null; }
+
+          // JSON number grammar: -?(0|[1-9][0-9]*)(.[0-9]+)?([eE][+-]?[0-9]+)?
+          int start = pos;
+          bool isFloat = false;
+          if (json[pos] == '-') pos++;
+          if (pos < json.Length && json[pos] == '0') {
+            pos++;
+          } else if (pos < json.Length && json[pos] >= '1' && json[pos] <= '9') {
+            SkipDigits(json, ref pos);
+          } else {
+            throw BadJson(start);
+          }
+          if (pos < json.Length && json[pos] == '.') {
+            pos++;
+            if (!SkipDigits(json, ref pos)) throw BadJson(pos);
+            isFloat = true;
+          }
+          if (pos < json.Length && (json[pos] == 'e' || json[pos] == 'E')) {
+            pos++;
+            if (pos < json.Length && (json[pos] == '+' || json[pos] == '-')) pos++;
+            if (!SkipDigits(json, ref pos)) throw BadJson(pos);
+            isFloat = true;
+          }
+          string num = json.Substring(start, pos - start);
+          var inv = CultureInfo.InvariantCulture;
+          double dbl;
+          if (isFloat) {
+            if (double.TryParse(num, NumberStyles.Float, inv, out dbl)) return dbl;
+          } else {
+            int i32;
+            long i64;
+            decimal dec;
+            if (int.TryParse(num, NumberStyles.AllowLeadingSign, inv, out i32)) return i32;
+            if (long.TryParse(num, NumberStyles.AllowLeadingSign, inv, out i64)) return i64;
+            if (decimal.TryParse(num, NumberStyles.AllowLeadingSign, inv, out dec)) return dec;  // very large ints
+          }
+          throw BadJson(start);
+        }
+
+        static string ReadJsonString(string json, ref int pos) {
+          var sb = new StringBuilder();
+          pos++;  // opening quote
+          while (pos < json.Length) {
+            char c = json[pos++];
+            if (c == '"') return sb.ToString();
+            if (c != '\\') { sb.Append(c); continue; }
+            if (pos >= json.Length) break;
+            char e = json[pos++];
+            switch (e) {
+              case '"': sb.Append('"'); break;
+              case '\\': sb.Append('\\'); break;
+              case '/': sb.Append('/'); break;
+              case 'b': sb.Append('\b'); break;
+              case 'f': sb.Append('\f'); break;
+              case 'n': sb.Append('\n'); break;
+              case 'r': sb.Append('\r'); break;
+              case 't': sb.Append('\t'); break;
+              case 'u':
+                int code;
+                if (pos + 4 > json.Length ||
+                    !int.TryParse(json.Substring(pos, 4), NumberStyles.AllowHexSpecifier, CultureInfo.InvariantCulture, out code))
+                  throw BadJson(pos);
+                sb.Append((char)code);
+                pos += 4;
+                break;
+              default:
+                throw BadJson(pos - 1);
+            }
+          }
+          throw new ArgumentException("Unterminated string in JSON patch");
+        }
+
+        // false when there was not a single digit
+        static bool SkipDigits(string json, ref int pos) {
+          int start = pos;
+          while (pos < json.Length && json[pos] >= '0' && json[pos] <= '9') pos++;
+          return pos > start;
+        }
+
+        static void SkipWs(string json, ref int pos) {
+          while (pos < json.Length && char.IsWhiteSpace(json[pos])) pos++;
+        }
+
+        static ArgumentException BadJson(int pos) {
+          return new ArgumentException("Invalid JSON patch at offset " + pos);
+        }
+
+        // Apply (and clear) everything queued with Add/AddJson
+        public void Apply(object root) {
+          Trie todo = pending;
+          pending = new Trie();
+          ApplyNode(root, todo);
+        }
+
+        public void SetValue(object root, string path, object value) {
+          Add(path, value);
+          Apply(root);
+        }
+
+        static void ApplyNode(object parent, Trie node) {
+          foreach (var kv in node.Children) {
+            Trie child = kv.Value;
+            if (child.HasValue)
+              Assign(parent, kv.Key, child.Value, child.Path);
+            if (child.Children.Count > 0) {
+              object next = Step(parent, kv.Key);
+              if (next == null)
+                throw new ArgumentException("Could not resolve path: " + child.Path);
+              ApplyNode(next, child);
+            }
+          }
+        }
+
+        static void Assign(object parent, object token, object value, string path) {
+          string key = token as string;
+          var node = parent as Node;
+          if (key != null && node != null) {
+            node.Set(key, value);
+            return;
+          }
+          object target = Unwrap(parent);
+          var list = token is int ? target as IList : null;
+          if (list != null) {
+            int idx = (int)token;
+            if (idx >= list.Count)
+              throw new AssignException("Cannot assign index " + idx + " at " + path);
+            try {
+              list[idx] = value;
+            } catch (Exception e) {
+              if (!IsStoreFailure(e)) throw;
+              throw new AssignException("Cannot assign index " + idx + " at " + path + ": " + e.Message);
+            }
+            return;
+          }
+          var d = target as IDictionary;
+          if (d == null)
+            throw new AssignException("Cannot assign " + (key != null ? "key" : "index " + token) +
+                                      " on " + target.GetType().FullName + " at " + path);
+          try {
+            d[FindKey(d, token) ?? token] = value;   // a new key is stored as parsed
+          } catch (Exception e) {
+            if (!IsStoreFailure(e)) throw;
+            throw new AssignException("Cannot assign key " + token + " at " + path + ": " + e.Message);
+          }
+        }
+
+        // Wrong element/value type for a typed array, list or dict, or a read-only/fixed-size one
+        static bool IsStoreFailure(Exception e) {
+          return e is InvalidCastException || e is NotSupportedException || e is ArgumentException;
+        }
+
+        static object Unwrap(object o) {
+          var n = o as Node;
+          return n != null ? n.Data : o;
+        }
+
+        // One path step; null when it cannot be resolved
+        static object Step(object cur, object token) {
+          string key = token as string;
+          var node = cur as Node;
+          if (key != null && node != null) {
+            object v;
+            return node.TryGet(key, out v) ? v : null;   // Node keys are always strings
+          }
+          cur = Unwrap(cur);
+          var list = token is int ? cur as IList : null;
+          if (list != null) {
+            int idx = (int)token;
+            return idx < list.Count ? list[idx] : null;
+          }
+          // [n] on a dictionary looks up the key n, as a string key would
+          var d = cur as IDictionary;
+          if (d == null) return null;
+          object k = FindKey(d, token);
+          return k != null ? d[k] : null;
+        }
+
+        // The dictionary key matching a path token: the token itself, else a
+        // key whose ToString() equals it (Int64 or enum keys, "3" for [3]); null if none
+        static object FindKey(IDictionary d, object token) {
+          if (d.Contains(token)) return token;
+          string text = token.ToString();
+          Type tokenType = token.GetType();
+          // keys of the token's own type were already answered by Contains; only convert the others
+          foreach (DictionaryEntry e in d) {
+            if (e.Key == null || e.Key.GetType() == tokenType) continue;
+            if (e.Key.ToString() == text) return e.Key;
+          }
+          return null;
+        }
+
+        // Parsed paths are immutable, so repeated paths (batch runs, shared
+        // --set lists) are tokenized once; bounded like lru_cache(512)
+        private const int ParseCacheSize = 512;
+        private static readonly Dictionary<string, List<object>> parsed = new Dictionary<string, List<object>>();
+
+        static List<object> Parse(string s) {
+          List<object> tokens;
+          if (parsed.TryGetValue(s, out tokens)) return tokens;
+          tokens = Tokenize(s);
+          if (parsed.Count >= ParseCacheSize) parsed.Clear();
+          parsed[s] = tokens;
+          return tokens;
+        }
+
+        // Tokens are strings (.field) or boxed ints ([index])
+        static List<object> Tokenize(string s) {
+          var tokens = new List<object>();
+          int n = s.Length;
+          int pos = ScanIdent(s, 0);  // first token without dot
+          if (pos > 0) tokens.Add(s.Substring(0, pos));
+          while (pos < n) {
+            char c = s[pos];
+            if (c == '.') {
+              int end = ScanIdent(s, pos + 1);
+              if (end > pos + 1) {
+                tokens.Add(s.Substring(pos + 1, end - pos - 1));
+                pos = end;
+                continue;
+              }
+            } else if (c == '[') {
+              int end = s.IndexOf(']', pos + 1);
+              int idx;
+              if (end > pos + 1 &&
+                  int.TryParse(s.Substring(pos + 1, end - pos - 1), NumberStyles.None, CultureInfo.InvariantCulture, out idx)) {
+                tokens.Add(idx);
+                pos = end + 1;
+                continue;
+              }
+            }
+            throw new ArgumentException("Invalid path near: " + s.Substring(pos));
+          }
+          return tokens;
+        }
+
+        // End of the identifier ([A-Za-z_]\w*) starting at s[i], or i if there is none
+        static int ScanIdent(string s, int i) {
+          if (i >= s.Length) return i;
+          char c = s[i];
+          if (!((c >= 'A' && c <= 'Z') || (c >= 'a' && c <= 'z') || c == '_')) return i;
+          i++;
+          while (i < s.Length && (char.IsLetterOrDigit(s[i]) || s[i] == '_')) i++;
+          return i;
+        }
+      }
     }
     '''
 
+def _helper_cache_paths():
+    """Candidate locations of the compiled helpers, in order of preference.
+
+    Next to the script first: that is the mounted /work directory in the
+    documented `docker run --rm` setup, so the DLL outlives the container.
+    ~/.cache/kat_edit/ is the fallback when the script directory is read-only.
+    The source hash is part of the name.
+    """
+    name = f"KatRoundtrip-{hashlib.sha1(_HELPER_CS.encode('utf-8')).hexdigest()[:16]}.dll"
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return [os.path.join(os.path.dirname(os.path.abspath(__file__)), name),
+            os.path.join(base, "kat_edit", name)]
+
+def _compile_cached(cache_dll):
+    """Compile the helpers to cache_dll; False when that location is not writable."""
+    try:
+        os.makedirs(os.path.dirname(cache_dll), exist_ok=True)
+        root, ext = os.path.splitext(cache_dll)
+        tmp = f"{root}.{os.getpid()}{ext}"
+        _compile_helpers(tmp)
+        os.replace(tmp, cache_dll)  # atomic, so concurrent runs never see a partial DLL
+        return True
+    except (OSError, RuntimeError):
+        # unwritable location (csc reports that as a compile error)
+        return False
+
+def _compile_helpers(output=None):
+    """Compile _HELPER_CS, to `output` if given, else in memory (returns the assembly)."""
+    from Microsoft.CSharp import CSharpCodeProvider
+    from System.CodeDom.Compiler import CompilerParameters
+
     provider = CSharpCodeProvider()
     parms = CompilerParameters()
-    parms.GenerateInMemory = True
+    parms.GenerateInMemory = output is None
+    if output is not None:
+        parms.OutputAssembly = output
     parms.GenerateExecutable = False
     parms.TreatWarningsAsErrors = False
     parms.ReferencedAssemblies.Add("System.dll")
     parms.ReferencedAssemblies.Add("System.Core.dll")
     parms.ReferencedAssemblies.Add("mscorlib.dll")
 
-    res = provider.CompileAssemblyFromSource(parms, cs)
+    res = provider.CompileAssemblyFromSource(parms, _HELPER_CS)
     if res.Errors.HasErrors:
         raise RuntimeError("\n".join(str(e) for e in res.Errors))
+    return res.CompiledAssembly if output is None else None
+
+def build_helper_types():
+    """Load the KatRoundtrip helpers once per process; later calls reuse them.
+
+    The compiled DLL is kept next to this script (or under ~/.cache/kat_edit/)
+    so csc only runs the first time, or after _HELPER_CS changes. Falls back to
+    an in-memory compile when neither location is writable.
+    """
+    global _HELPER_CACHE
+    if _HELPER_CACHE:
+        return _HELPER_CACHE
+
+    import clr
+    try:
+        clr.AddReference("System")
+        clr.AddReference("System.Core")
+        clr.AddReference("Microsoft.CSharp")
+    except Exception:
+        pass
+
+    from System.Reflection import Assembly
 
-    asm = res.CompiledAssembly
+    candidates = _helper_cache_paths()
+    cache_dll = next((p for p in candidates if os.path.exists(p)), None)
+    if cache_dll is None:
+        cache_dll = next((p for p in candidates if _compile_cached(p)), None)
+
+    asm = Assembly.LoadFrom(cache_dll) if cache_dll else _compile_helpers()
     NodeType = asm.GetType("KatRoundtrip.Node")
     BinderType = asm.GetType("KatRoundtrip.RedirectBinder")
-    return NodeType, BinderType
+    _HELPER_CACHE = (NodeType, BinderType)
+    return _HELPER_CACHE
 
-def deserialize(path, BinderType):
-    from System.IO import FileStream, FileMode, FileAccess
-    from System.Runtime.Serialization.Formatters.Binary import BinaryFormatter
+def _new_helper(name):
+    """Instantiate KatRoundtrip.<name> from the helper assembly."""
     from System import Activator
+    NodeType, _ = build_helper_types()
+    return Activator.CreateInstance(NodeType.Assembly.GetType("KatRoundtrip." + name))
+
+_IO_BUFFER = 1 << 20  # 1 MiB: BinaryFormatter reads/writes in tiny chunks
 
-    bf = BinaryFormatter()
-    bf.Binder = Activator.CreateInstance(BinderType)
+# Formatters keep no per-call state once configured; reuse them across files
+_BF_READ = None    # (BinderType, BinaryFormatter with that binder)
+_BF_WRITE = None
 
-    fs = FileStream(path, FileMode.Open, FileAccess.Read)
+def deserialize(path, BinderType):
+    global _BF_READ
+    from System.IO import File, MemoryStream
+
+    if _BF_READ is None or _BF_READ[0] != BinderType:
+        from System.Runtime.Serialization.Formatters.Binary import BinaryFormatter
+        from System import Activator
+        bf = BinaryFormatter()
+        bf.Binder = Activator.CreateInstance(BinderType)
+        _BF_READ = (BinderType, bf)
+    bf = _BF_READ[1]
+
+    # Saves are small enough to slurp: one read instead of a syscall per record
+    ms = MemoryStream(File.ReadAllBytes(path), False)
     try:
-        obj = bf.Deserialize(fs)
+        obj = bf.Deserialize(ms)
     finally:
-        fs.Close()
+        ms.Close()
     return obj
 
 def serialize(path, obj):
-    from System.IO import FileStream, FileMode, FileAccess
-    from System.Runtime.Serialization.Formatters.Binary import BinaryFormatter
+    global _BF_WRITE
+    from System.IO import FileStream, FileMode, FileAccess, BufferedStream
 
-    bf = BinaryFormatter()
-    fs = FileStream(path, FileMode.Create, FileAccess.Write)
+    if _BF_WRITE is None:
+        from System.Runtime.Serialization.Formatters.Binary import BinaryFormatter
+        _BF_WRITE = BinaryFormatter()
+    bf = _BF_WRITE
+    bs = BufferedStream(FileStream(path, FileMode.Create, FileAccess.Write), _IO_BUFFER)
     try:
-        bf.Serialize(fs, obj)
+        bf.Serialize(bs, obj)
     finally:
-        fs.Close()
-
-# ---------- JSON dump helpers (optional) ----------
-def to_jsonable(o):
-    from System import String, DateTime, Decimal, Guid, Array, Byte
-    from System.Collections import IDictionary, IEnumerable
-    from System.Reflection import BindingFlags
-    from System.Runtime.CompilerServices import RuntimeHelpers
-
-    seen = set()
-
-    def conv(x):
-        if x is None or isinstance(x, (str, int, float, bool)):
-            return x
-        try:
-            oid = RuntimeHelpers.GetHashCode(x)
-            if oid in seen:
-                return None
-            seen.add(oid)
-        except Exception:
-            pass
-
-        tname = None
-        try:
-            tname = str(x.GetType().FullName)
-        except Exception:
-            tname = None
-
-        if tname == "KatRoundtrip.Node":
-            d = {"$original_dotnet_type": str(getattr(x, "FullTypeName", "")),
-                 "$original_assembly":   str(getattr(x, "AssemblyName", ""))}
-            data = getattr(x, "Data", None)
-            if data is not None:
-                py = {}
-                for k in data.Keys:
-                    py[str(k)] = conv(data[k])
-                d.update(py)
-            return d
-
-        if tname is not None:
-            # value-like
-            if "System.DateTime" == tname:
-                return x.ToString("o")
-            if "System.Decimal" == tname:
-                return float(x)
-            if "System.Guid" == tname:
-                return str(x)
-
-        try:
-            if isinstance(x, Array) and x.GetType().GetElementType() in (Byte,):
-                return [int(b) for b in x]
-        except Exception:
-            pass
-
-        # IDictionary
-        from System.Collections import IDictionary as _IDict, IEnumerable as _IEnum
-        if isinstance(x, _IDict):
-            d = {}
-            for k in x.Keys:
-                d[str(k)] = conv(x[k])
-            return d
-
-        # IEnumerable (not string)
-        if isinstance(x, _IEnum) and not isinstance(x, String):
-            lst = []
-            it = x.GetEnumerator()
-            try:
-                while it.MoveNext():
-                    lst.append(conv(it.Current))
-            except Exception:
-                pass
-            return lst
-
-        # fallback reflection
-        try:
-            obj = {"$type": tname}
-            flags = BindingFlags.Instance | BindingFlags.Public | BindingFlags.NonPublic
-            for f in x.GetType().GetFields(flags):
-                try:
-                    obj[f.Name] = conv(f.GetValue(x))
-                except Exception:
-                    pass
-            return obj
-        except Exception:
-            try:
-                return str(x)
-            except Exception:
-                return None
-
-    return conv(o)
+        bs.Close()  # flushes, then closes the FileStream
 
 # ---------- Path editing ----------
-_path_token = re.compile(r"""
-    (?: \. (?P<key>[A-Za-z_]\w*) )       # .field
-  | (?: \[ (?P<idx>\d+) \] )             # [index]
-  | (?: ^(?P<root>[A-Za-z_]\w*) )        # first token without dot
-""", re.X)
-
-def parse_path(s):
-    tokens = []
-    pos = 0
-    while pos < len(s):
-        m = _path_token.match(s, pos)
-        if not m:
-            raise ValueError(f"Invalid path near: {s[pos:]}")
-        if m.group("root"): tokens.append(("key", m.group("root")))
-        if m.group("key"):  tokens.append(("key", m.group("key")))
-        if m.group("idx"):  tokens.append(("idx", int(m.group("idx"))))
-        pos = m.end()
-    return tokens
-
-def get_node_data_if_any(obj):
-    # If obj is our Node, return its Data dictionary; else None
-    try:
-        if str(obj.GetType().FullName) == "KatRoundtrip.Node":
-            return getattr(obj, "Data")
-    except Exception:
-        pass
-    return None
-
-def traverse_for_set(root, path_tokens):
-    """
-    Walk path and return (parent, last_token) so we can assign.
-    - On Nodes, we traverse into Node.Data.
-    - On dict-like (.NET IDictionary), use keys.
-    - On lists (IList/arrays), use indices.
-    """
-    from System.Collections import IDictionary
-    from System import Array
-
-    def dict_get(d, key):
-        # Works for generic Dictionary<K,V> and non-generic IDictionary
-        try:
-            if hasattr(d, "ContainsKey") and d.ContainsKey(key):
-                return d[key]
-            if isinstance(d, IDictionary) and d.Contains(key):
-                return d[key]
-        except Exception:
-            pass
-        # last-resort: iterate Keys (slower)
-        try:
-            for k in d.Keys:
-                if str(k) == str(key):
-                    return d[k]
-        except Exception:
-            pass
-        return None
-
-    cur = root
-    parent = None
-    last = None
-
-    for tk_kind, tk_val in path_tokens:
-        parent = cur
-        last = (tk_kind, tk_val)
-
-        # auto-step into Node.Data when we’re on a KatRoundtrip.Node
-        data = get_node_data_if_any(cur)
-        if data is not None:
-            cur = data
-
-        if tk_kind == "key":
-            if isinstance(cur, dict):
-                cur = cur.get(tk_val, None)
-            elif isinstance(cur, IDictionary) or hasattr(cur, "ContainsKey"):
-                cur = dict_get(cur, tk_val)
-            else:
-                return parent, last, None
-
-        elif tk_kind == "idx":
-            try:
-                cur = cur[tk_val]
-            except Exception:
-                # try IList-style get_Item
-                try:
-                    cur = cur.get_Item(tk_val)
-                except Exception:
-                    return parent, last, None
-
-    return parent, last, cur
+_KEYWORD_START = frozenset("tTfFnN")
 
 def parse_value_literal(s):
     # unquoted -> number/bool/null; quoted -> string (keep contents)
-    if len(s) >= 2 and ((s[0] == s[-1] == '"') or (s[0] == s[-1] == "'")):
-        return s[1:-1]
-    sl = s.lower()
-    if sl == "true": return True
-    if sl == "false": return False
-    if sl == "null": return None
+    # dispatch on the first character so the common cases skip the rest
+    c = s[:1]
+    if not c:
+        return s
+    if c == '"' or c == "'":
+        return s[1:-1] if len(s) >= 2 and s[-1] == c else s
+    if c in _KEYWORD_START:
+        sl = s.lower()
+        if sl == "true": return True
+        if sl == "false": return False
+        if sl == "null": return None
+        return s  # nothing numeric starts with these letters
+    if c == "0" and len(s) > 1 and s[1].isdigit():
+        # leading zeros -> treat as string unless quoted
+        return s
     # int or float
     try:
-        if s.startswith("0") and len(s) > 1 and s[1].isdigit():
-            # leading zeros -> treat as string unless quoted
-            return s
-        if "." in s or "e" in sl:
+        if "." in s or "e" in s or "E" in s:
             return float(s)
         return int(s)
     except ValueError:
         return s
 
+def _apply_literals(root, pairs, patch_json=None):
+    """Queue a JSON patch and (path, value_literal) pairs on a KatRoundtrip.Walker,
+    then apply them all in one walk."""
+    from System import ArgumentException
+    walker = _new_helper("Walker")
+    try:
+        if patch_json is not None:
+            walker.AddJson(patch_json)
+        for path, value_literal in pairs:
+            walker.Add(path, _to_net(parse_value_literal(value_literal)))  # <<< important
+        walker.Apply(root)
+    except ArgumentException as e:
+        # unresolvable paths are ValueError; failed stores are TypeError, as before
+        err = TypeError if e.GetType().Name == "AssignException" else ValueError
+        raise err(str(e.Message)) from None
+
 def set_value(root, path_expr, value_literal):
-    tokens = parse_path(path_expr)
-    parent, last, _cur = traverse_for_set(root, tokens)
-    if parent is None or last is None:
-        raise ValueError(f"Could not resolve path: {path_expr}")
-
-    py_val = parse_value_literal(value_literal)
-    net_val = _to_net(py_val)  # <<< important
-
-    parent_data = get_node_data_if_any(parent)
-    target = parent_data if parent_data is not None else parent
-
-    kind, key = last
-    from System.Collections import IDictionary
-    if kind == "key":
-        if hasattr(target, "ContainsKey") or isinstance(target, IDictionary):
-            target[key] = net_val
-        elif isinstance(target, dict):
-            target[key] = py_val  # pure Python dict (unlikely)
-        else:
-            raise TypeError(f"Cannot assign key on {type(target)} at {path_expr}")
-    elif kind == "idx":
-        try:
-            target[key] = net_val
-        except Exception:
-            try:
-                target.set_Item(key, net_val)
-            except Exception as e:
-                raise TypeError(f"Cannot assign index {key}: {e}")
+    _apply_literals(root, [(path_expr, value_literal)])
+
+def read_patch(path):
+    """Text of a --set-json file (None when no file was given)."""
+    if path is None:
+        return None
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+def apply_assignments(obj, assignments, patch_json=None):
+    # apply the --set-json patch, then all --set path=value (those win over
+    # the patch at and below their path); paths sharing a prefix are walked once
+    pairs = []
+    for assignment in (assignments or []):
+        if "=" not in assignment:
+            raise ValueError(f"--set must be path=value, got: {assignment}")
+        path, value = assignment.split("=", 1)
+        pairs.append((path.strip(), value.strip()))
+    _apply_literals(obj, pairs, patch_json)
 
 def cmd_dump(args):
     import clr
+    from System import Console
     NodeType, BinderType = build_helper_types()
     obj = deserialize(args.input, BinderType)
-    j = to_jsonable(obj)
-    json.dump(j, sys.stdout, ensure_ascii=False, indent=2)
+    # The whole document is written by one managed call (KatRoundtrip.JsonDump)
+    sys.stdout.flush()
+    _new_helper("JsonDump").Write(obj, Console.OpenStandardOutput(), args.assume_tree)
 
 def cmd_edit(args):
     import clr
     NodeType, BinderType = build_helper_types()
     obj = deserialize(args.input, BinderType)
 
-    # apply all --set path=value
-    for assignment in (args.set or []):
-        if "=" not in assignment:
-            raise ValueError(f"--set must be path=value, got: {assignment}")
-        path, value = assignment.split("=", 1)
-        set_value(obj, path.strip(), value.strip())
-
+    apply_assignments(obj, args.set, read_patch(args.set_json))
     serialize(args.output, obj)
 
+def batch_outputs(inputs, outdir):
+    """Output path for each input; refuses to overwrite an input or write one file twice."""
+    inputs_real = {os.path.realpath(p) for p in inputs}
+    outputs, seen = [], {}
+    for path in inputs:
+        out = os.path.join(outdir, os.path.basename(path))
+        real = os.path.realpath(out)
+        if real in inputs_real:
+            raise ValueError(f"batch would overwrite input {path}; choose another --outdir")
+        if real in seen:
+            raise ValueError(f"{seen[real]} and {path} would both be written to {out}")
+        seen[real] = path
+        outputs.append(out)
+    return outputs
+
+def cmd_batch(args):
+    # One process for all inputs, so the helper assembly is compiled only once
+    import clr
+    NodeType, BinderType = build_helper_types()
+    patch_json = read_patch(args.set_json)
+    outputs = batch_outputs(args.inputs, args.outdir)
+    os.makedirs(args.outdir, exist_ok=True)
+    for path, out in zip(args.inputs, outputs):
+        obj = deserialize(path, BinderType)
+        apply_assignments(obj, args.set, patch_json)
+        serialize(out, obj)
+        print(out, file=sys.stderr)
+
 def main():
     ap = argparse.ArgumentParser(description="Edit Everbyte .kat saves (BinaryFormatter) without original assemblies.")
     sp = ap.add_subparsers(dest="cmd", required=True)
 
     ap_dump = sp.add_parser("dump", help="Dump save to JSON")
     ap_dump.add_argument("input")
+    ap_dump.add_argument("--assume-tree", action="store_true",
+                         help="Skip shared/cyclic reference tracking (faster; only for saves without cycles)")
     ap_dump.set_defaults(func=cmd_dump)
 
     ap_edit = sp.add_parser("edit", help="Edit fields and write a new .kat")
     ap_edit.add_argument("input")
     ap_edit.add_argument("output")
     ap_edit.add_argument("--set", action="append", help='Path assignment like: coins=999 or userSettings.energyCap=120 or paths[0].activeState=true')
+    ap_edit.add_argument("--set-json", metavar="PATCH", help='JSON file of values to assign, like {"coins": 999, "userSettings": {"energyCap": 120}}; '
+                         'only the fields to change, not a full dump. --set wins over the patch at and below its path')
     ap_edit.set_defaults(func=cmd_edit)
 
+    ap_batch = sp.add_parser("batch", help="Apply the same edits to several saves in one run")
+    ap_batch.add_argument("inputs", nargs="+")
+    ap_batch.add_argument("--outdir", required=True, help="Directory for the patched copies (same file names as the inputs)")
+    ap_batch.add_argument("--set", action="append", help='Path assignment, same syntax as for "edit"')
+    ap_batch.add_argument("--set-json", metavar="PATCH", help='JSON patch file, same format as for "edit"')
+    ap_batch.set_defaults(func=cmd_batch)
+
     args = ap.parse_args()
     args.func(args)
 
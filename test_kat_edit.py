@@ -0,0 +1,170 @@
+"""Walker / JSON patch checks on a hand-built Node tree (needs pythonnet + Mono)."""
+
+import pytest
+
+pytest.importorskip("clr")
+
+import kat_edit
+
+
+@pytest.fixture
+def root():
+    from System import Activator, Array, Boolean, Int32, Object
+    from System.Collections.Generic import Dictionary, List
+
+    NodeType, _ = kat_edit.build_helper_types()
+
+    def node(**fields):
+        n = Activator.CreateInstance(NodeType)
+        for k, v in fields.items():
+            n.Data[k] = v
+        return n
+
+    paths = List[Object]()
+    paths.Add(node(activeState=Boolean(False)))
+    by_id = Dictionary[Int32, Object]()
+    by_id[Int32(3)] = node(level=Int32(1))
+    return node(
+        coins=Int32(5),
+        userSettings=node(energyCap=Int32(100)),
+        paths=paths,
+        ints=Array[Int32]([1, 2, 3]),
+        byId=by_id,
+    )
+
+
+def test_set_paths(root):
+    kat_edit.apply_assignments(root, [
+        "coins=999",
+        "userSettings.energyCap=120",
+        "paths[0].activeState=true",
+        "ints[1]=7",
+        'username="00123"',
+    ])
+    assert root.Data["coins"] == 999
+    assert root.Data["userSettings"].Data["energyCap"] == 120
+    assert root.Data["paths"][0].Data["activeState"] is True
+    assert list(root.Data["ints"]) == [1, 7, 3]
+    assert root.Data["username"] == "00123"
+
+
+def test_int_keys_on_dictionaries(root):
+    from System import Int32
+    kat_edit.apply_assignments(root, ["byId[3].level=2", "byId[4]=7"])
+    by_id = root.Data["byId"]
+    assert by_id[Int32(3)].Data["level"] == 2
+    assert by_id[Int32(4)] == 7
+    kat_edit.apply_assignments(root, ["byId[3]=5"])
+    assert by_id[Int32(3)] == 5
+
+
+def test_json_patch(root):
+    patch = '{"coins": 7, "userSettings": {"energyCap": 1.5e1}, "paths": [{"activeState": true}], "name": "A\\u00e9"}'
+    kat_edit.apply_assignments(root, [], patch)
+    assert root.Data["coins"] == 7
+    assert root.Data["userSettings"].Data["energyCap"] == 15.0
+    assert root.Data["paths"][0].Data["activeState"] is True
+    assert root.Data["name"] == "Aé"
+
+
+def test_set_wins_over_patch(root):
+    kat_edit.apply_assignments(root, ["coins=1"], '{"coins": 2}')
+    assert root.Data["coins"] == 1
+
+
+@pytest.mark.parametrize("value, expected", [("null", None), ("5", 5)])
+def test_set_replaces_patch_below_its_path(root, value, expected):
+    kat_edit.apply_assignments(root, [f"userSettings={value}"], '{"userSettings": {"energyCap": 1}}')
+    assert root.Data["userSettings"] == expected
+
+
+def test_numbers(root):
+    kat_edit.apply_assignments(root, [], '{"a": 2147483648, "b": -3, "c": 0, "d": -0.5E-2}')
+    assert root.Data["a"] == 2147483648
+    assert root.Data["b"] == -3
+    assert root.Data["c"] == 0
+    assert root.Data["d"] == -0.005
+
+
+@pytest.mark.parametrize("patch", [
+    '{"coins": 01}',
+    '{"coins": +5}',
+    '{"coins": 1.}',
+    '{"coins": .5}',
+    '{"coins": 1e}',
+    '{"coins": 1,}',
+    '{"coins" 1}',
+    '{"coins": tru}',
+    '{"coins": "x}',
+    '[1]',
+    '{}',
+    '{"userSettings": {}}',
+    '{"paths": []}',
+    '{"$type": "x", "coins": 1}',
+    '{"userSettings": {"$original_dotnet_type": "Settings", "energyCap": 1}}',
+])
+def test_invalid_patch_is_rejected(root, patch):
+    with pytest.raises(ValueError):
+        kat_edit.apply_assignments(root, [], patch)
+    assert root.Data["coins"] == 5
+
+
+@pytest.mark.parametrize("assignment", [
+    "a..b=1",
+    "paths[x]=1",
+    "paths[0]]=1",
+    ".=1",
+    "missing.x=1",
+    "paths[5].activeState=1",
+    "byId[9].level=1",
+])
+def test_bad_paths_raise_value_error(root, assignment):
+    with pytest.raises(ValueError):
+        kat_edit.apply_assignments(root, [assignment])
+
+
+@pytest.mark.parametrize("assignment", [
+    'ints[0]="str"',
+    "ints[0]=3000000000",
+    "ints[9]=1",
+    "coins.x=1",
+])
+def test_failed_stores_raise_type_error(root, assignment):
+    with pytest.raises(TypeError):
+        kat_edit.apply_assignments(root, [assignment])
+
+
+def _dump(obj, assume_tree=False):
+    from System.IO import MemoryStream
+    from System.Text import Encoding
+    ms = MemoryStream()
+    kat_edit._new_helper("JsonDump").Write(obj, ms, assume_tree)
+    return Encoding.UTF8.GetString(ms.ToArray())
+
+
+def test_dump_matches_json_dump(root):
+    import json
+    from System import Double
+
+    floats = [0.7999999999999999, 0.1, 1e16, 1e15, 1e-5, 1e-4, 123.456, -0.0,
+              1.5e300, 5e-324, 2.2250738585072014e-308, float("inf"), float("nan")]
+    for i, f in enumerate(floats):
+        root.Data[f"f{i}"] = Double(f)
+    root.Data["text"] = 'quote" back\\ nl\n ctl\x01 é'
+
+    expected = {"$original_dotnet_type": "", "$original_assembly": "",
+                "coins": 5,
+                "userSettings": {"$original_dotnet_type": "", "$original_assembly": "", "energyCap": 100},
+                "paths": [{"$original_dotnet_type": "", "$original_assembly": "", "activeState": False}],
+                "ints": [1, 2, 3],
+                "byId": {"3": {"$original_dotnet_type": "", "$original_assembly": "", "level": 1}}}
+    expected.update({f"f{i}": f for i, f in enumerate(floats)})
+    expected["text"] = root.Data["text"]
+    assert _dump(root) == json.dumps(expected, ensure_ascii=False, indent=2)
+
+
+def test_dump_cycles(root):
+    root.Data["self"] = root
+    assert '"self": null' in _dump(root)
+    with pytest.raises(Exception, match="nested deeper"):
+        _dump(root, assume_tree=True)